@@ -42,6 +42,13 @@ def main():
             "- Extracts ESG signals with an LLM\n"
             "- Computes E/S/G scores out of 100"
         )
+        # score_website already caches results on disk (skipping 'no data' runs);
+        # this bypasses that cache for a fresh crawl.
+        force_refresh = st.checkbox(
+            "Force refresh",
+            value=False,
+            help="Ignore cached results and re-run crawling and LLM extraction.",
+        )
 
     default_example = "tesla"
     raw_input_value = st.text_input(
@@ -63,7 +70,7 @@ def main():
         company_hint = infer_company_hint(raw_input_value)
         url = normalize_input(raw_input_value)
 
-        result = score_website(url, company_name=company_hint)
+        result = score_website(url, company_name=company_hint, force_refresh=force_refresh)
 
     # === Scores section ===
     st.subheader("ESG Scores")
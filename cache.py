@@ -0,0 +1,41 @@
+# cache.py
+import hashlib
+
+from diskcache import Cache
+
+CACHE_DIR = ".esg_cache"
+
+# Fetched HTML and extracted PDF text are kept for a week
+HTTP_CACHE_TTL = 7 * 24 * 3600
+
+_cache = Cache(CACHE_DIR)
+
+
+def url_key(namespace: str, url: str) -> str:
+    """
+    Stable cache key for a URL, e.g. 'html:<sha1>' or 'pdf_text:<sha1>'.
+    """
+    return f"{namespace}:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+
+def get_cached(key: str):
+    return _cache.get(key)
+
+
+def set_cached(key: str, value, expire: int = HTTP_CACHE_TTL) -> None:
+    _cache.set(key, value, expire=expire)
+
+
+def conditional_headers(entry: dict | None) -> dict:
+    """
+    If-None-Match / If-Modified-Since headers for revalidating a cached response.
+    """
+    if not entry:
+        return {}
+
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
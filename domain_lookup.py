@@ -1,7 +1,9 @@
 # domain_lookup.py
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, parse_qs, unquote
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; ESGScraper/1.0)"
@@ -9,6 +11,13 @@ DEFAULT_HEADERS = {
 
 SEARCH_URL = "https://duckduckgo.com/html/"
 
+# Reuse TCP/TLS connections across lookups instead of a handshake per request
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.2)),
+)
+
 
 def _extract_target_url(href: str) -> str | None:
     """
@@ -39,30 +48,33 @@ def lookup_domain(company_name: str, timeout: int = 10) -> str | None:
     params = {"q": query}
 
     try:
-        resp = requests.get(SEARCH_URL, params=params, headers=DEFAULT_HEADERS, timeout=timeout)
+        resp = _SESSION.get(SEARCH_URL, params=params, headers=DEFAULT_HEADERS, timeout=timeout)
         resp.raise_for_status()
     except Exception:
         return None
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    tree = LexborHTMLParser(resp.text)
 
-    # Prefer links with the 'result__a' class (main results)
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        target = _extract_target_url(href)
-        if not target:
-            continue
+    # Prefer links with the 'result__a' class (main results), then any link
+    for selector in ("a.result__a[href]", "a[href]"):
+        for a in tree.css(selector):
+            href = a.attributes.get("href")
+            if not href:
+                continue
+            target = _extract_target_url(href)
+            if not target:
+                continue
 
-        parsed_target = urlparse(target)
-        netloc = parsed_target.netloc
-        if not netloc:
-            continue
+            parsed_target = urlparse(target)
+            netloc = parsed_target.netloc
+            if not netloc:
+                continue
 
-        # Ignore DuckDuckGo itself, take the first external domain
-        if "duckduckgo.com" in netloc:
-            continue
+            # Ignore DuckDuckGo itself, take the first external domain
+            if "duckduckgo.com" in netloc:
+                continue
 
-        # Normalize to https://<domain>
-        return f"https://{netloc}"
+            # Normalize to https://<domain>
+            return f"https://{netloc}"
 
-    return None
\ No newline at end of file
+    return None
@@ -1,23 +1,132 @@
 # embeddings.py
+import hashlib
+from functools import lru_cache
+
+from diskcache import Cache
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
-_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+try:
+    import faiss
+except ImportError:  # only needed for large corpora; numpy path works without it
+    faiss = None
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+# Persistent text-hash -> embedding cache, so boilerplate repeated across pages
+# and runs (footers, cookie banners, re-crawled reports) is only encoded once.
+EMBEDDING_CACHE_DIR = ".emb_cache"
+_emb_cache = Cache(EMBEDDING_CACHE_DIR)
+
+# encode() already sorts inputs by length before batching, so larger batches
+# mostly cut per-batch overhead without adding much padding.
+EMBED_BATCH_SIZE = 64
+
+# MiniLM only looks at the first 256 tokens (~4 chars each in English), so
+# anything past ~1k chars is tokenized and then thrown away. Cap both chunk
+# length and chunk count.
+MAX_SEQ_LENGTH = 256
+MAX_CHUNK_CHARS = 1024
+MAX_CHUNKS = 2000
+
+# Above this many chunks, search through a multithreaded FAISS inner-product index
+FAISS_MIN_CHUNKS = 500
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model() -> SentenceTransformer:
+    """
+    Load MiniLM once per process and reuse it.
+    Streamlit reruns app.py on every interaction, so this keeps the
+    ONNX session warm instead of paying the load cost on import/rerun.
+    """
+    # ONNX backend with the INT8 (AVX-512 VNNI) export of MiniLM: roughly 2-3x faster
+    # encode on CPU; outputs are still float32.
+    model = SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        backend="onnx",
+        model_kwargs={"file_name": EMBEDDING_MODEL_FILE},
+    )
+    model.max_seq_length = MAX_SEQ_LENGTH
+    return model
+
+
+def _cache_key(text: str) -> str:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_MODEL_FILE}:{MAX_SEQ_LENGTH}:{digest}"
 
 
 class VectorStore:
     def __init__(self, chunks: list[str]):
-        self.chunks = chunks
-        self.embeddings = self._encode(chunks)
+        if len(chunks) > MAX_CHUNKS:
+            print(f"  -> VectorStore: {len(chunks)} chunks given, only indexing the first {MAX_CHUNKS}.")
+        self.chunks = chunks[:MAX_CHUNKS]
+        # Only the embedded text is truncated; search() still returns full chunks
+        self.embeddings = self._encode([c[:MAX_CHUNK_CHARS] for c in self.chunks])
+
+        self.index = None
+        if faiss is not None and len(self.chunks) > FAISS_MIN_CHUNKS:
+            self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
+            self.index.add(np.ascontiguousarray(self.embeddings, dtype=np.float32))
 
     def _encode(self, texts: list[str]) -> np.ndarray:
-        emb = _model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        norms = np.linalg.norm(emb, axis=1, keepdims=True) + 1e-10
-        return emb / norms
+        """
+        Embed texts, only running the model on ones not already in the disk cache.
+        """
+        keys = [_cache_key(t) for t in texts]
+        vectors = [_emb_cache.get(key) for key in keys]
+        # Unique missing texts only, so duplicates within one call are encoded once
+        misses = {keys[i]: texts[i] for i, vec in enumerate(vectors) if vec is None}
+
+        if misses:
+            emb = get_embedding_model().encode(
+                list(misses.values()),
+                batch_size=EMBED_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            # Unit vectors fit comfortably in float16; halves memory and the bytes
+            # streamed through the similarity product.
+            emb = emb.astype(np.float16)
+            encoded = dict(zip(misses, emb))
+            with _emb_cache.transact():
+                for key, vec in encoded.items():
+                    _emb_cache.set(key, vec)
+            vectors = [encoded[key] if vec is None else vec for key, vec in zip(keys, vectors)]
+
+        if not vectors:
+            dim = get_embedding_model().get_sentence_embedding_dimension()
+            return np.empty((0, dim), dtype=np.float16)
+
+        # Keep rows C-contiguous
+        return np.ascontiguousarray(np.stack(vectors), dtype=np.float16)
+
+    def _similarities(self, q_emb: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of q_emb against every stored row.
+        numpy has no fast float16 matmul, so rows are upcast to float32 for one
+        BLAS sgemv. Only small stores get here (FAISS handles large ones), where
+        a single product beats tiling it across threads.
+        """
+        return self.embeddings.astype(np.float32) @ q_emb
 
     def search(self, query: str, k: int = 5) -> list[str]:
-        q_emb = _model.encode([query], convert_to_numpy=True)[0]
-        q_emb = q_emb / (np.linalg.norm(q_emb) + 1e-10)
-        sims = self.embeddings @ q_emb
-        idx = np.argsort(-sims)[:k]
-        return [self.chunks[i] for i in idx]
\ No newline at end of file
+        q_emb = get_embedding_model().encode(
+            [query], convert_to_numpy=True, normalize_embeddings=True
+        )[0]
+
+        if self.index is not None:
+            # Vectors are unit-norm, so inner product == cosine
+            _, ids = self.index.search(np.ascontiguousarray(q_emb[None, :], dtype=np.float32), k)
+            return [self.chunks[i] for i in ids[0] if i >= 0]
+
+        sims = self._similarities(np.ascontiguousarray(q_emb, dtype=np.float32))
+        if len(sims) > k:
+            # O(N) partition, then only sort the k winners
+            part = np.argpartition(-sims, k - 1)[:k]
+            idx = part[np.argsort(-sims[part])]
+        else:
+            idx = np.argsort(-sims)
+        return [self.chunks[i] for i in idx]
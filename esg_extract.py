@@ -1,33 +1,124 @@
 # esg_extract.py
 
-from typing import List, Dict, Any
-from openai import OpenAI
-import json
-
-client = OpenAI()
-
-# Use a stronger model for ESG extraction
-ESG_MODEL = "gpt-4o"  # change to gpt-4o-mini if you want it cheaper
-
-
-def _build_prompt(text: str) -> str:
-    return f"""
-You are an ESG analyst. You will be given text from ESG, sustainability, or impact reports
-and related analysis about a single company.
+from typing import Iterable, List, Dict, Any
+import asyncio
+import re
+
+import numpy as np
+import orjson
+from openai import APIError
+
+from embeddings import VectorStore
+from llm_client import make_async_client
+
+# The cheap model handles this bounded JSON extraction fine; we only escalate
+# to the stronger one when its output is unusable (see _needs_fallback).
+PRIMARY_MODEL = "gpt-4o-mini"
+FALLBACK_MODEL = "gpt-4o"
+
+# Chunks whose embedding is this close to an already-selected chunk are dropped
+NEAR_DUPLICATE_COSINE = 0.92
+_DEDUP_BLOCK_SIZE = 64
+
+PILLARS = ("E", "S", "G")
+PILLAR_NAMES = {"E": "Environmental", "S": "Social", "G": "Governance"}
+
+# Each pillar's text is packed into up to PILLAR_MAX_BUNDLES prompts of ~17k chars;
+# every (pillar, bundle) call runs concurrently, at most LLM_CONCURRENCY at a time.
+PILLAR_MAX_CHARS = 17000
+PILLAR_MAX_BUNDLES = 2
+LLM_CONCURRENCY = 8
+
+# Cheap keyword routing: a chunk goes into a pillar's bundle if it mentions any of these
+PILLAR_KEYWORDS = {
+    "E": [
+        "net zero", "net-zero", "climate", "carbon", "emission", "greenhouse", "ghg",
+        "scope 1", "scope 2", "scope 3", "renewable", "energy", "environment",
+    ],
+    "S": [
+        "diversity", "inclusion", "equity", "dei", "women", "female", "employee",
+        "wellbeing", "well-being", "safety", "health", "community", "philanthrop",
+        "volunteer", "social",
+    ],
+    "G": [
+        "board", "director", "independent", "governance", "corruption", "bribery",
+        "whistleblow", "speak up", "ethic", "code of conduct", "compliance",
+        "risk management", "committee",
+    ],
+}
+_PILLAR_RES = {
+    pillar: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + ")", re.IGNORECASE)
+    for pillar, keywords in PILLAR_KEYWORDS.items()
+}
+_ANY_PILLAR_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for kws in PILLAR_KEYWORDS.values() for k in kws) + ")",
+    re.IGNORECASE,
+)
+
+
+def _object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # Strict structured outputs require every key listed and no extras
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
 
-Your job is to extract clear, factual ESG signals and output a STRICT JSON object
-with this exact structure and keys:
 
-{{
-  "E": {{
+_BOOL = {"type": "boolean"}
+_INT_OR_NULL = {"type": ["integer", "null"]}
+_NUM_OR_NULL = {"type": ["number", "null"]}
+
+# JSON Schema mirroring _default_structure(); passed to the API in strict mode so
+# replies are guaranteed to parse and contain every key.
+ESG_JSON_SCHEMA = _object_schema({
+    "E": _object_schema({
+        "has_net_zero_target": _BOOL,
+        "net_zero_year": _INT_OR_NULL,
+        "uses_renewable_energy": _BOOL,
+        "renewable_share_pct": _NUM_OR_NULL,
+        "discloses_scope_1_2": _BOOL,
+        "discloses_scope_3": _BOOL,
+    }),
+    "S": _object_schema({
+        "has_diversity_policy": _BOOL,
+        "female_leadership_pct": _NUM_OR_NULL,
+        "employee_wellbeing_programs": _BOOL,
+        "workplace_safety_programs": _BOOL,
+        "community_programs": _BOOL,
+
+        "mentions_diversity_or_inclusion": _BOOL,
+        "mentions_employee_safety_or_health": _BOOL,
+        "mentions_community_or_philanthropy": _BOOL,
+    }),
+    "G": _object_schema({
+        "has_independent_board": _BOOL,
+        "board_independence_pct": _NUM_OR_NULL,
+        "has_anti_corruption_policy": _BOOL,
+        "has_whistleblower_mechanism": _BOOL,
+        "has_esg_governance_structure": _BOOL,
+
+        "mentions_board_or_directors": _BOOL,
+        "mentions_ethics_or_code_of_conduct": _BOOL,
+        "mentions_compliance_or_risk_management": _BOOL,
+    }),
+})
+
+
+# Per-pillar slices of the output structure and interpretation rules
+_PILLAR_SCHEMA_TEXT = {
+    "E": """\
+  "E": {
     "has_net_zero_target": true/false,
     "net_zero_year": int or null,
     "uses_renewable_energy": true/false,
     "renewable_share_pct": float or null,
     "discloses_scope_1_2": true/false,
     "discloses_scope_3": true/false
-  }},
-  "S": {{
+  }""",
+    "S": """\
+  "S": {
     "has_diversity_policy": true/false,
     "female_leadership_pct": float or null,
     "employee_wellbeing_programs": true/false,
@@ -37,8 +128,9 @@ with this exact structure and keys:
     "mentions_diversity_or_inclusion": true/false,
     "mentions_employee_safety_or_health": true/false,
     "mentions_community_or_philanthropy": true/false
-  }},
-  "G": {{
+  }""",
+    "G": """\
+  "G": {
     "has_independent_board": true/false,
     "board_independence_pct": float or null,
     "has_anti_corruption_policy": true/false,
@@ -48,11 +140,11 @@ with this exact structure and keys:
     "mentions_board_or_directors": true/false,
     "mentions_ethics_or_code_of_conduct": true/false,
     "mentions_compliance_or_risk_management": true/false
-  }}
-}}
-
-INTERPRETATION RULES (VERY IMPORTANT):
+  }""",
+}
 
+_PILLAR_RULES = {
+    "E": """\
 ENVIRONMENT (E)
 - If the text clearly indicates a climate or net-zero target, set has_net_zero_target=true.
   Examples:
@@ -64,8 +156,8 @@ ENVIRONMENT (E)
 - If a percentage of energy from renewables is given, set renewable_share_pct to that value.
 - If greenhouse gas emissions for Scope 1 and 2 are disclosed, set discloses_scope_1_2=true.
 - If Scope 3 emissions are disclosed, set discloses_scope_3=true.
-- If the text does not mention something at all, set the boolean to false and numeric fields to null.
-
+- If the text does not mention something at all, set the boolean to false and numeric fields to null.""",
+    "S": """\
 SOCIAL (S)
 - has_diversity_policy:
   - Set to true if there is any indication of a formal or informal diversity, equity,
@@ -94,8 +186,8 @@ SOCIAL (S)
     or similar topics at all.
 - mentions_community_or_philanthropy:
   - True if the text mentions communities, charitable activities, philanthropy, donations,
-    volunteering, or community impact.
-
+    volunteering, or community impact.""",
+    "G": """\
 GOVERNANCE (G)
 - has_independent_board:
   - True if there is explicit mention of independent directors or an independent board structure.
@@ -118,7 +210,25 @@ GOVERNANCE (G)
   - True if the text mentions ethics, ethical behavior, conduct, code of conduct, integrity.
 - mentions_compliance_or_risk_management:
   - True if the text mentions compliance, regulatory compliance, risk management frameworks,
-    internal controls, or similar topics.
+    internal controls, or similar topics.""",
+}
+
+
+def _build_prompt(text: str, pillar: str) -> str:
+    return f"""
+You are an ESG analyst. You will be given text from ESG, sustainability, or impact reports
+and related analysis about a single company.
+
+Your job is to extract clear, factual {PILLAR_NAMES[pillar]} ({pillar}) signals and output a STRICT JSON object
+with this exact structure and keys:
+
+{{
+{_PILLAR_SCHEMA_TEXT[pillar]}
+}}
+
+INTERPRETATION RULES (VERY IMPORTANT):
+
+{_PILLAR_RULES[pillar]}
 
 GENERAL RULES
 - If the text clearly indicates a positive signal, set the boolean to true.
@@ -172,6 +282,7 @@ def _default_structure() -> Dict[str, Any]:
 
 
 def _ensure_structure(d: Dict[str, Any]) -> Dict[str, Any]:
+    # Safety net only: strict schema output already has every key
     base = _default_structure()
     for pillar in base:
         if pillar not in d or not isinstance(d[pillar], dict):
@@ -181,12 +292,19 @@ def _ensure_structure(d: Dict[str, Any]) -> Dict[str, Any]:
     return d
 
 
-def _call_llm_for_esg(text: str) -> Dict[str, Any]:
-    prompt = _build_prompt(text)
-
-    resp = client.chat.completions.create(
-        model=ESG_MODEL,
-        response_format={"type": "json_object"},
+async def _request_pillar_json(client, text: str, pillar: str, model: str) -> Dict[str, Any] | None:
+    """
+    Ask `model` for one pillar's JSON. Returns None on a refusal or unparseable reply.
+    """
+    prompt = _build_prompt(text, pillar)
+    schema = _object_schema({pillar: ESG_JSON_SCHEMA["properties"][pillar]})
+
+    resp = await client.chat.completions.create(
+        model=model,
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": f"esg_signals_{pillar}", "strict": True, "schema": schema},
+        },
         messages=[
             {
                 "role": "system",
@@ -197,31 +315,207 @@ def _call_llm_for_esg(text: str) -> Dict[str, Any]:
         temperature=0.1,
     )
 
-    raw = resp.choices[0].message.content.strip()
+    # content is None when the model refuses; the schema guarantees everything else parses
+    raw = resp.choices[0].message.content
+    if not raw:
+        return None
 
     try:
-        data = json.loads(raw)
+        data = orjson.loads(raw)
     except Exception:
-        data = _default_structure()
+        return None
+
+    return data if isinstance(data, dict) else None
+
+
+def _needs_fallback(d: Dict[str, Any], pillar: str) -> bool:
+    """
+    True if more than half of the pillar's keys are missing from the reply,
+    i.e. _ensure_structure would mostly be filling in defaults.
+    """
+    keys = _default_structure()[pillar]
+    got = d.get(pillar)
+    if not isinstance(got, dict):
+        return True
+    missing = sum(1 for k in keys if k not in got)
+    return missing > len(keys) / 2
+
+
+async def _try_request_pillar_json(client, text: str, pillar: str, model: str) -> Dict[str, Any] | None:
+    """
+    _request_pillar_json, but an API failure (rate limit, timeout, 5xx) is
+    logged and returned as None so one call can't sink the other pillars.
+    """
+    try:
+        return await _request_pillar_json(client, text, pillar, model)
+    except APIError as e:
+        print(f"  -> {model} request for pillar {pillar} failed: {e.__class__.__name__}")
+        return None
 
-    data = _ensure_structure(data)
-    return data
+
+async def _extract_pillar(client, text: str, pillar: str) -> Dict[str, Any]:
+    data = await _try_request_pillar_json(client, text, pillar, PRIMARY_MODEL)
+
+    if data is None or _needs_fallback(data, pillar):
+        fallback = await _try_request_pillar_json(client, text, pillar, FALLBACK_MODEL)
+        if fallback is not None:
+            data = fallback
+
+    pillar_data = (data or {}).get(pillar)
+    return pillar_data if isinstance(pillar_data, dict) else {}
+
+
+def _merge_pillar_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine one pillar's answers from several bundles: a flag is true if any
+    bundle found it, and a value is taken from the first bundle that has one.
+    """
+    merged: Dict[str, Any] = {}
+    for result in results:
+        for k, v in result.items():
+            cur = merged.get(k)
+            if cur is None or (cur is False and v is not None):
+                merged[k] = v
+    return merged
+
+
+async def _extract_all_pillars(bundles: Dict[str, List[str]]) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def extract_one(text: str, pillar: str) -> Dict[str, Any]:
+        async with sem:
+            return await _extract_pillar(client, text, pillar)
+
+    jobs = [(pillar, text) for pillar in PILLARS for text in bundles[pillar]]
+    async with make_async_client() as client:
+        results = await asyncio.gather(*(extract_one(text, pillar) for pillar, text in jobs))
+
+    per_pillar: Dict[str, List[Dict[str, Any]]] = {pillar: [] for pillar in PILLARS}
+    for (pillar, _), result in zip(jobs, results):
+        per_pillar[pillar].append(result)
+
+    return _ensure_structure({
+        pillar: _merge_pillar_results(per_pillar[pillar]) for pillar in PILLARS
+    })
+
+
+def _embed_missing(chunks: List[str], vectors: Dict[str, np.ndarray]) -> None:
+    """
+    Add float32 embeddings for any of `chunks` not yet in `vectors`, in one encode call.
+    """
+    missing = [ch for ch in dict.fromkeys(chunks) if ch not in vectors]
+    if missing:
+        vectors.update(zip(missing, VectorStore(missing).embeddings.astype(np.float32)))
+
+
+def _select_distinct_chunks(
+    chunks: List[str],
+    max_chars: int,
+    vectors: Dict[str, np.ndarray],
+) -> List[str]:
+    """
+    Walk chunks in order and keep each one unless it is a near-duplicate
+    (cosine > NEAR_DUPLICATE_COSINE) of a chunk we already kept.
+    Stops once the joined text would exceed max_chars.
+    Chunks are embedded in blocks, only as far as the walk gets, into the
+    shared `vectors` map, so a chunk used by several pillars is embedded once.
+    """
+    selected: List[str] = []
+    kept = None  # running matrix of accepted (unit-norm) embeddings
+    total_len = 0
+
+    for start in range(0, len(chunks), _DEDUP_BLOCK_SIZE):
+        block = chunks[start:start + _DEDUP_BLOCK_SIZE]
+        _embed_missing(block, vectors)
+
+        for ch in block:
+            if total_len + len(ch) > max_chars:
+                return selected
+
+            # Embeddings are normalized, so the dot product is the cosine
+            emb = vectors[ch]
+            if kept is not None and float(np.max(kept @ emb)) > NEAR_DUPLICATE_COSINE:
+                continue
+
+            selected.append(ch)
+            kept = emb[None, :] if kept is None else np.vstack([kept, emb])
+            total_len += len("\n\n") + len(ch)
+
+    return selected
+
+
+def _pillar_chunks(chunks: List[str], pillar: str) -> List[str]:
+    """
+    Chunks that mention the pillar's keywords, in their original order.
+    Falls back to all chunks if none match so the pillar still gets context.
+    """
+    pattern = _PILLAR_RES[pillar]
+    matching = [ch for ch in chunks if pattern.search(ch)]
+    return matching or chunks
+
+
+def filter_esg_chunks(chunks: Iterable[str]) -> List[str]:
+    """
+    Cheap pre-filter before any embedding or LLM work: drop exact duplicate
+    chunks and chunks that mention none of the E/S/G keywords.
+    Accepts any iterable (e.g. a chunk generator) and consumes it once.
+    Returns all unique chunks if nothing matches, so extraction still has context.
+    """
+    seen = set()
+    unique = []
+    kept = []
+    for ch in chunks:
+        if ch in seen:
+            continue
+        seen.add(ch)
+        unique.append(ch)
+        if _ANY_PILLAR_RE.search(ch):
+            kept.append(ch)
+    return kept or unique
+
+
+def _build_bundles(
+    chunks: List[str],
+    max_chars: int,
+    max_bundles: int,
+    vectors: Dict[str, np.ndarray],
+) -> List[str]:
+    """
+    Pack the distinct chunks, in order, into at most max_bundles prompts of
+    up to max_chars each. Always returns at least one (possibly empty) bundle.
+    """
+    bundles: List[str] = []
+    parts: List[str] = []
+    length = 0
+
+    for ch in _select_distinct_chunks(chunks, max_chars * max_bundles, vectors):
+        if parts and length + len(ch) > max_chars:
+            bundles.append("".join(parts))
+            parts, length = [], 0
+            if len(bundles) == max_bundles:
+                break
+        parts.append("\n\n" + ch)
+        length += len("\n\n") + len(ch)
+
+    if parts and len(bundles) < max_bundles:
+        bundles.append("".join(parts))
+    return bundles or [""]
 
 
 def extract_esg_signals(chunks: List[str]) -> Dict[str, Any]:
     """
     Takes a list of text chunks and returns a single ESG signal dict.
-    We join up to ~50k characters so the model sees enough context
-    without hitting context limits.
+    Chunks are routed by keyword into E, S and G bundles (~17k chars each,
+    near-duplicates skipped), every bundle is extracted by its own
+    concurrent LLM call, and the answers are merged into one dict.
     """
     if not chunks:
         return _default_structure()
 
-    max_chars = 50000
-    combined = ""
-    for ch in chunks:
-        if len(combined) + len(ch) > max_chars:
-            break
-        combined += "\n\n" + ch
-
-    return _call_llm_for_esg(combined)
\ No newline at end of file
+    # Chunk text -> embedding, shared by all three pillars' near-duplicate passes
+    vectors: Dict[str, np.ndarray] = {}
+    bundles = {
+        pillar: _build_bundles(_pillar_chunks(chunks, pillar), PILLAR_MAX_CHARS, PILLAR_MAX_BUNDLES, vectors)
+        for pillar in PILLARS
+    }
+    return asyncio.run(_extract_all_pillars(bundles))
@@ -1,11 +1,26 @@
 # esg_search.py
+import math
 import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from scrape import DEFAULT_HEADERS
 
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 SERPER_URL = "https://google.serper.dev/search"
 
+# Reuse TCP/TLS connections to Serper instead of a handshake per request
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.2)),
+)
+
+# PDF / HTML templates are tried in order and the first one with hits wins, so
+# only the first few are sent up front; the rest are queried only on a miss.
+FIRST_PASS_TEMPLATES = 2
+
 PDF_QUERY_TEMPLATES = [
     "{name} ESG report pdf",
     "{name} sustainability report pdf",
@@ -55,46 +70,60 @@ PDF_KEYWORDS = [
 ]
 
 
+# One case-insensitive C-level scan instead of lowercasing + a substring test per keyword
+_ESG_RE = re.compile("|".join(re.escape(k) for k in PDF_KEYWORDS), re.IGNORECASE)
+_PDF_RE = re.compile(r"\.pdf(?:$|\?)", re.IGNORECASE)
+
+
 def _is_pdf(url: str) -> bool:
-    return url.lower().endswith(".pdf")
+    return bool(_PDF_RE.search(url))
 
 
 def _looks_esg(url: str, title: str | None) -> bool:
-    text = (url + " " + (title or "")).lower()
-    return any(k in text for k in PDF_KEYWORDS)
+    return bool(_ESG_RE.search(url) or (title and _ESG_RE.search(title)))
 
 
-def _serper_search(query: str) -> list[dict]:
-    if not SERPER_API_KEY:
-        return []
+def _serper_search(queries: list[str]) -> list[list[dict]]:
+    """
+    Send all queries to Serper as ONE batched request (Serper accepts a JSON
+    array of query objects) and return the organic results for each query,
+    in the same order as the input.
+    """
+    if not SERPER_API_KEY or not queries:
+        return [[] for _ in queries]
 
     headers = {
         "X-API-KEY": SERPER_API_KEY,
         "Content-Type": "application/json",
         **DEFAULT_HEADERS,
     }
-    payload = {"q": query, "num": 10}
+    payload = [{"q": q, "num": 10} for q in queries]
 
     try:
-        resp = requests.post(SERPER_URL, json=payload, headers=headers, timeout=20)
+        resp = _SESSION.post(SERPER_URL, json=payload, headers=headers, timeout=20)
         resp.raise_for_status()
-        return resp.json().get("organic", []) or []
+        data = resp.json()
     except Exception:
-        return []
+        return [[] for _ in queries]
 
+    # A single query may come back as a bare object rather than a list
+    if isinstance(data, dict):
+        data = [data]
 
-def search_esg_pdfs(company_name: str, max_results: int = 5) -> list[str]:
-    if not SERPER_API_KEY:
-        print("  -> SERPER_API_KEY not set; skipping external ESG PDF search.")
-        return []
+    results = [(item or {}).get("organic", []) or [] for item in data]
+    results += [[] for _ in range(len(queries) - len(results))]
+    return results[:len(queries)]
 
-    pdfs: list[str] = []
 
-    for template in PDF_QUERY_TEMPLATES:
-        query = template.format(name=company_name)
-        print(f"    -> PDF query: {query}")
-        results = _serper_search(query)
+def _queries(templates: list[str], company_name: str) -> list[str]:
+    return [template.format(name=company_name) for template in templates]
+
 
+def _pick_pdfs(results_per_query: list[list[dict]], max_results: int) -> list[str]:
+    # Take hits from the first query template that yields any
+    pdfs: list[str] = []
+
+    for results in results_per_query:
         for r in results:
             url = r.get("link")
             title = r.get("title")
@@ -112,26 +141,14 @@ def search_esg_pdfs(company_name: str, max_results: int = 5) -> list[str]:
         if pdfs:
             break
 
-    pdfs = list(dict.fromkeys(pdfs))
-    print(f"  -> External ESG search found {len(pdfs)} ESG PDFs.")
-    return pdfs
+    return list(dict.fromkeys(pdfs))
 
 
-def search_esg_html_pages(company_name: str, max_results: int = 5) -> list[str]:
-    """
-    Use Serper to find ESG-related HTML pages (not PDFs).
-    """
-    if not SERPER_API_KEY:
-        print("  -> SERPER_API_KEY not set; skipping external ESG HTML search.")
-        return []
-
+def _pick_html_pages(results_per_query: list[list[dict]], max_results: int) -> list[str]:
+    # Same as _pick_pdfs, but for non-PDF pages
     urls: list[str] = []
 
-    for template in HTML_QUERY_TEMPLATES:
-        query = template.format(name=company_name)
-        print(f"    -> HTML query: {query}")
-        results = _serper_search(query)
-
+    for results in results_per_query:
         for r in results:
             url = r.get("link")
             title = r.get("title")
@@ -149,39 +166,40 @@ def search_esg_html_pages(company_name: str, max_results: int = 5) -> list[str]:
         if urls:
             break
 
-    urls = list(dict.fromkeys(urls))
-    print(f"  -> External ESG HTML search found {len(urls)} pages.")
-    return urls
+    return list(dict.fromkeys(urls))
 
 
-def search_esg_snippets(company_name: str, max_results: int = 15) -> list[str]:
-    """
-    Use Serper to directly retrieve ESG-related text snippets from the web
-    (search result snippets / text fields).
+def _snippet_per_query_limit(max_results: int) -> int:
+    # Spread budget roughly evenly per query, at least 2 each
+    return max(2, max_results // len(SNIPPET_QUERY_TEMPLATES))
 
-    IMPORTANT:
-    - We intentionally pull snippets from ALL query templates (E, S, G).
-    - We limit how many snippets we take per query so that we keep
-      a balanced mix across Environment, Social, and Governance.
+
+def _snippet_templates(max_results: int) -> list[str]:
     """
-    if not SERPER_API_KEY:
-        print("  -> SERPER_API_KEY not set; skipping external ESG snippet search.")
-        return []
+    Only as many snippet templates as can contribute to max_results, picked
+    evenly across the list so E, S and G all stay represented.
+    """
+    n = len(SNIPPET_QUERY_TEMPLATES)
+    k = min(n, math.ceil(max_results / _snippet_per_query_limit(max_results)))
+    return [SNIPPET_QUERY_TEMPLATES[i * n // k] for i in range(k)]
 
-    snippets: list[str] = []
 
-    # Spread budget roughly evenly per query
-    num_queries = len(SNIPPET_QUERY_TEMPLATES)
-    per_query_limit = max(2, max_results // num_queries)  # at least 2 each
+def _search_staged(queries: list[str], pick, max_results: int) -> list[str]:
+    # First FIRST_PASS_TEMPLATES queries, then the rest only if they found nothing
+    found = pick(_serper_search(queries[:FIRST_PASS_TEMPLATES]), max_results)
+    if not found and len(queries) > FIRST_PASS_TEMPLATES:
+        found = pick(_serper_search(queries[FIRST_PASS_TEMPLATES:]), max_results)
+    return found
+
 
-    for template in SNIPPET_QUERY_TEMPLATES:
+def _pick_snippets(results_per_query: list[list[dict]], max_results: int) -> list[str]:
+    snippets: list[str] = []
+    per_query_limit = _snippet_per_query_limit(max_results)
+
+    for results in results_per_query:
         if len(snippets) >= max_results:
             break
 
-        query = template.format(name=company_name)
-        print(f"    -> Snippet query: {query}")
-        results = _serper_search(query)
-
         taken_here = 0
         for r in results:
             if len(snippets) >= max_results or taken_here >= per_query_limit:
@@ -206,5 +224,108 @@ def search_esg_snippets(company_name: str, max_results: int = 15) -> list[str]:
             snippets.append(combined)
             taken_here += 1
 
+    return snippets
+
+
+def search_esg_pdfs(company_name: str, max_results: int = 5) -> list[str]:
+    if not SERPER_API_KEY:
+        print("  -> SERPER_API_KEY not set; skipping external ESG PDF search.")
+        return []
+
+    queries = _queries(PDF_QUERY_TEMPLATES, company_name)
+    for query in queries:
+        print(f"    -> PDF query: {query}")
+
+    pdfs = _search_staged(queries, _pick_pdfs, max_results)
+    print(f"  -> External ESG search found {len(pdfs)} ESG PDFs.")
+    return pdfs
+
+
+def search_esg_html_pages(company_name: str, max_results: int = 5) -> list[str]:
+    """
+    Use Serper to find ESG-related HTML pages (not PDFs).
+    """
+    if not SERPER_API_KEY:
+        print("  -> SERPER_API_KEY not set; skipping external ESG HTML search.")
+        return []
+
+    queries = _queries(HTML_QUERY_TEMPLATES, company_name)
+    for query in queries:
+        print(f"    -> HTML query: {query}")
+
+    urls = _search_staged(queries, _pick_html_pages, max_results)
+    print(f"  -> External ESG HTML search found {len(urls)} pages.")
+    return urls
+
+
+def search_esg_snippets(company_name: str, max_results: int = 15) -> list[str]:
+    """
+    Use Serper to directly retrieve ESG-related text snippets from the web
+    (search result snippets / text fields).
+
+    IMPORTANT:
+    - We pull snippets from templates spread across E, S and G, but only
+      as many templates as max_results can actually use.
+    - We limit how many snippets we take per query so that we keep
+      a balanced mix across Environment, Social, and Governance.
+    """
+    if not SERPER_API_KEY:
+        print("  -> SERPER_API_KEY not set; skipping external ESG snippet search.")
+        return []
+
+    queries = _queries(_snippet_templates(max_results), company_name)
+    for query in queries:
+        print(f"    -> Snippet query: {query}")
+
+    snippets = _pick_snippets(_serper_search(queries), max_results)
     print(f"  -> External ESG snippet search collected {len(snippets)} text snippets.")
-    return snippets
\ No newline at end of file
+    return snippets
+
+
+def search_esg_sources(company_name: str) -> tuple[list[str], list[str], list[str]]:
+    """
+    Run the PDF, HTML page and snippet searches as one Serper batch request
+    (plus a second one only if the first PDF / HTML templates found nothing)
+    and return (pdf_urls, html_urls, snippets), each picked exactly as
+    search_esg_pdfs / search_esg_html_pages / search_esg_snippets would.
+    """
+    if not SERPER_API_KEY:
+        print("  -> SERPER_API_KEY not set; skipping external ESG search.")
+        return [], [], []
+
+    pdf_queries = _queries(PDF_QUERY_TEMPLATES, company_name)
+    html_queries = _queries(HTML_QUERY_TEMPLATES, company_name)
+    snippet_queries = _queries(_snippet_templates(15), company_name)
+    first_pdf, rest_pdf = pdf_queries[:FIRST_PASS_TEMPLATES], pdf_queries[FIRST_PASS_TEMPLATES:]
+    first_html, rest_html = html_queries[:FIRST_PASS_TEMPLATES], html_queries[FIRST_PASS_TEMPLATES:]
+    print(
+        f"    -> Sending {len(first_pdf)} PDF, {len(first_html)} HTML and "
+        f"{len(snippet_queries)} snippet queries in one batch"
+    )
+
+    results = _serper_search(first_pdf + first_html + snippet_queries)
+    n_pdf, n_html = len(first_pdf), len(first_html)
+
+    pdfs = _pick_pdfs(results[:n_pdf], max_results=5)
+    urls = _pick_html_pages(results[n_pdf:n_pdf + n_html], max_results=5)
+    snippets = _pick_snippets(results[n_pdf + n_html:], max_results=15)
+
+    # Fall back to the remaining templates only for whatever came up empty
+    retry_pdf = rest_pdf if not pdfs else []
+    retry_html = rest_html if not urls else []
+    if retry_pdf or retry_html:
+        print(
+            f"    -> Retrying with {len(retry_pdf)} more PDF and "
+            f"{len(retry_html)} more HTML queries"
+        )
+        results = _serper_search(retry_pdf + retry_html)
+        if retry_pdf:
+            pdfs = _pick_pdfs(results[:len(retry_pdf)], max_results=5)
+        if retry_html:
+            urls = _pick_html_pages(results[len(retry_pdf):], max_results=5)
+
+    print(
+        f"  -> External ESG search found {len(pdfs)} ESG PDFs, {len(urls)} HTML pages "
+        f"and {len(snippets)} text snippets."
+    )
+    return pdfs, urls, snippets
@@ -1,9 +1,7 @@
 # explain.py
-import os
-import json
-from openai import OpenAI
+import orjson
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_client import get_client
 
 SYSTEM_PROMPT = (
     "You are an ESG consultant. Explain ESG scores in concise, business-friendly language."
@@ -22,10 +20,10 @@ def explain_scores(root_url: str, esg_signals: dict, esg_scores: dict) -> str:
         "1) A 120-word overview of the company's ESG performance.\n"
         "2) Three key strengths (bullet points).\n"
         "3) Three priority improvement actions (bullet points).\n\n"
-        f"Data:\n{json.dumps(payload, indent=2)}"
+        f"Data:\n{orjson.dumps(payload).decode()}"
     )
 
-    resp = client.chat.completions.create(
+    resp = get_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -0,0 +1,27 @@
+# llm_client.py
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI, DefaultHttpxClient
+
+_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """
+    One pooled HTTP/2 client shared by every sync OpenAI call in the pipeline,
+    so extraction and explanation don't each pay their own TCP/TLS handshake.
+    Built on first use, so importing this module never needs an API key.
+    DefaultHttpxClient keeps the SDK's own timeout / redirect defaults.
+    """
+    return OpenAI(http_client=DefaultHttpxClient(http2=True, limits=_LIMITS))
+
+
+def make_async_client() -> AsyncOpenAI:
+    """
+    Fresh async client for one event loop. httpx async connections are bound
+    to the loop that opened them and asyncio.run() closes its loop on exit,
+    so this can't be a shared singleton like get_client().
+    """
+    return AsyncOpenAI(http_client=DefaultAsyncHttpxClient(http2=True, limits=_LIMITS))
@@ -1,29 +1,34 @@
 # main.py
+import io
 from dataclasses import dataclass, field
-from typing import Iterable, Optional
-from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 
-from scrape import crawl_site, fetch_html, html_to_text
-from text_utils import combine_pages_text, chunk_text
-from esg_extract import extract_esg_signals
+import cache
+from scrape import crawl_site, fetch_html, parse_html
+from text_utils import combine_pages_text, dedupe_preserve_order, iter_chunks
 from score import compute_esg_scores
-from explain import explain_scores
 from domain_lookup import lookup_domain
 from pdf_utils import extract_pdf_texts
-from esg_search import (
-    search_esg_pdfs,
-    search_esg_html_pages,
-    search_esg_snippets,
-)
+from esg_search import search_esg_sources
 
 
-@dataclass
+# Whole-pipeline results are reused for a day
+SCORE_CACHE_TTL = 24 * 3600
+
+# External HTML pages: total time we wait for the batch, and max size per page
+EXTERNAL_HTML_BUDGET_S = 30
+EXTERNAL_HTML_MAX_BYTES = 1024 * 1024
+
+
+@dataclass(slots=True)
 class CrawlResult:
     pages: dict[str, str]
     pdf_urls: list[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class ExternalSources:
     pdf_urls: list[str] = field(default_factory=list)
     html_urls: list[str] = field(default_factory=list)
@@ -54,14 +59,14 @@ def crawl_with_fallback(root_url: str) -> CrawlResult:
     return CrawlResult(pages=pages_result, pdf_urls=pdfs_result)
 
 
-def dedupe_preserve_order(urls: Iterable[str]) -> list[str]:
-    seen = set()
-    unique_urls: list[str] = []
-    for url in urls:
-        if url not in seen:
-            seen.add(url)
-            unique_urls.append(url)
-    return unique_urls
+# "Is this a meaningful data point?" per value type (exact type lookup, so bool != int)
+_EVIDENCE_CHECKS = {
+    bool: bool,
+    int: lambda v: v != 0,
+    float: lambda v: v != 0,
+    str: lambda v: bool(v.strip()),
+    list: lambda v: len(v) > 0,
+}
 
 
 def count_esg_evidence(esg_signals: dict) -> int:
@@ -69,29 +74,13 @@ def count_esg_evidence(esg_signals: dict) -> int:
     Count how many 'meaningful' ESG data points we have.
     Rough heuristic to decide if we have enough for a narrative explanation.
     """
-    count = 0
-    for pillar in esg_signals.values():
-        for v in pillar.values():
-            if isinstance(v, bool) and v:
-                count += 1
-            elif isinstance(v, (int, float)) and v not in (0, None):
-                count += 1
-            elif isinstance(v, str) and v.strip():
-                count += 1
-            elif isinstance(v, list) and len(v) > 0:
-                count += 1
-    return count
+    values = chain.from_iterable(pillar.values() for pillar in esg_signals.values())
+    return sum(1 for v in values if (check := _EVIDENCE_CHECKS.get(type(v))) and check(v))
 
 
 def search_external_sources(company_name: str) -> ExternalSources:
-    print(f"  -> Searching external web for ESG PDFs for '{company_name}'...")
-    external_pdf_urls = search_esg_pdfs(company_name)
-
-    print(f"  -> Searching external web for ESG HTML pages for '{company_name}'...")
-    external_html_urls = search_esg_html_pages(company_name)
-
-    print(f"  -> Searching external web for ESG text snippets for '{company_name}'...")
-    external_snippets = search_esg_snippets(company_name)
+    print(f"  -> Searching external web for ESG PDFs, HTML pages and snippets for '{company_name}'...")
+    external_pdf_urls, external_html_urls, external_snippets = search_esg_sources(company_name)
 
     return ExternalSources(
         pdf_urls=external_pdf_urls,
@@ -101,20 +90,36 @@ def search_external_sources(company_name: str) -> ExternalSources:
 
 
 def fetch_external_html_texts(urls: list[str]) -> list[str]:
+    """
+    Fetch and clean external pages in parallel. Pages still in flight when
+    EXTERNAL_HTML_BUDGET_S runs out are abandoned; results keep the input order.
+    """
     def fetch_and_clean(url: str) -> str:
         try:
-            html = fetch_html(url)
-            txt = html_to_text(html)
+            html = fetch_html(url, max_bytes=EXTERNAL_HTML_MAX_BYTES)
+            txt, _ = parse_html(html)
             return txt.strip()
         except Exception:
             return ""
 
-    external_html_pages_text: list[str] = []
-    with ThreadPoolExecutor(max_workers=5) as ex:
-        for txt in ex.map(fetch_and_clean, urls):
-            if txt:
-                external_html_pages_text.append(txt)
-    return external_html_pages_text
+    texts = [""] * len(urls)
+    ex = ThreadPoolExecutor(max_workers=5)
+    try:
+        futures = {ex.submit(fetch_and_clean, url): idx for idx, url in enumerate(urls)}
+        for fut in as_completed(futures, timeout=EXTERNAL_HTML_BUDGET_S):
+            texts[futures[fut]] = fut.result()
+    except TimeoutError:
+        print(f"  -> External HTML budget of {EXTERNAL_HTML_BUDGET_S}s exceeded; skipping slow pages.")
+    finally:
+        # Don't block on stragglers
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    return [txt for txt in texts if txt]
+
+
+def _joined_length(parts: list[str]) -> int:
+    # len("\n\n".join(parts)) without building the joined copy
+    return sum(map(len, parts)) + 2 * max(len(parts) - 1, 0)
 
 
 def combine_text_sources(
@@ -123,18 +128,18 @@ def combine_text_sources(
     serper_snippets: list[str],
     on_site_text: str,
 ) -> str:
-    combined_parts: list[str] = []
-
-    if pdf_texts:
-        combined_parts.append("\n\n".join(pdf_texts))
-    if external_html_texts:
-        combined_parts.append("\n\n".join(external_html_texts))
-    if serper_snippets:
-        combined_parts.append("\n\n".join(serper_snippets))
-    if on_site_text:
-        combined_parts.append(on_site_text)
+    # Stream every part into one buffer instead of joining per source and again overall
+    buf = io.StringIO()
+    first = True
+    for part in chain(pdf_texts, external_html_texts, serper_snippets, [on_site_text]):
+        if not part:
+            continue
+        if not first:
+            buf.write("\n\n")
+        buf.write(part)
+        first = False
 
-    return "\n\n".join(combined_parts).strip()
+    return buf.getvalue().strip()
 
 
 def build_empty_text_response(
@@ -162,7 +167,37 @@ def build_empty_text_response(
     }
 
 
-def score_website(root_url: str, company_name: Optional[str] = None) -> dict:
+def score_website(
+    root_url: str,
+    company_name: Optional[str] = None,
+    force_refresh: bool = False,
+) -> dict:
+    """
+    Run the full pipeline, or return the cached result for the same
+    (root_url, company_name) if it was scored within SCORE_CACHE_TTL.
+    Pass force_refresh=True to ignore the cache and re-run everything.
+    """
+    key = cache.url_key("score", f"{root_url.strip()}|{company_name or ''}")
+
+    if not force_refresh:
+        cached = cache.get_cached(key)
+        if cached is not None:
+            print("  -> Using cached ESG result.")
+            return cached
+
+    result = _score_website_uncached(root_url, company_name)
+
+    # Don't pin a 'no data' result for a day; it may just be a transient fetch failure
+    if result["esg_signals"]:
+        cache.set_cached(key, result, expire=SCORE_CACHE_TTL)
+    return result
+
+
+def _score_website_uncached(root_url: str, company_name: Optional[str] = None) -> dict:
+    # Imported here so `import main` stays cheap: these pull in the embedding model stack
+    from esg_extract import extract_esg_signals, filter_esg_chunks
+    from explain import explain_scores
+
     # 1) On-site crawl
     crawl_result = crawl_with_fallback(root_url)
 
@@ -185,17 +220,16 @@ def score_website(root_url: str, company_name: Optional[str] = None) -> dict:
         )
         external_html_pages_text = fetch_external_html_texts(external_sources.html_urls)
 
-    print("  -> Combined external ESG HTML text length:", len("\n\n".join(external_html_pages_text)))
+    print("  -> Combined external ESG HTML text length:", _joined_length(external_html_pages_text))
 
     # 6) PDF text (PARALLEL DOWNLOAD + EXTRACT inside extract_pdf_texts)
     print(f"  -> Downloading and extracting {len(all_pdf_urls)} ESG PDFs in parallel...")
     pdf_texts = extract_pdf_texts(all_pdf_urls, max_workers=5)
-    combined_pdf_text = "\n\n".join(pdf_texts) if pdf_texts else ""
-    print("  -> Combined PDF text length:", len(combined_pdf_text))
+    print("  -> Combined PDF text length:", _joined_length(pdf_texts))
 
     # 7) Serper ESG snippets text
     serper_snippets_text = external_sources.snippets
-    print("  -> Combined Serper snippet text length:", len("\n\n".join(serper_snippets_text)))
+    print("  -> Combined Serper snippet text length:", _joined_length(serper_snippets_text))
 
     # 8) Combine everything with ESG priority:
     #    PDFs -> external ESG HTML -> snippets -> on-site HTML
@@ -214,7 +248,8 @@ def score_website(root_url: str, company_name: Optional[str] = None) -> dict:
 
     # 9) Chunk + extract
     print("  -> Chunking combined text...")
-    chunks = chunk_text(combined_text, chunk_size=2000, overlap=200)
+    chunks = filter_esg_chunks(iter_chunks(combined_text, chunk_size=2000, overlap=200))
+    print(f"  -> Kept {len(chunks)} chunks after ESG keyword filter.")
 
     print("  -> Extracting ESG signals with LLM...")
     esg_signals = extract_esg_signals(chunks)
@@ -275,7 +310,7 @@ def normalize_input(user_input: str) -> str:
     return f"https://{user_input}.com"
 
 
-if __name__ == "__main__":
+def main() -> None:
     raw = input("Enter a company name or URL (e.g. 'microsoft' or 'https://www.apple.com'): ").strip()
 
     if not raw:
@@ -317,4 +352,8 @@ if __name__ == "__main__":
 
     print("\nExplanation:\n")
     print(result["explanation"])
-    print()
\ No newline at end of file
+    print()
+
+
+if __name__ == "__main__":
+    main()
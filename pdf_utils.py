@@ -1,48 +1,122 @@
 # pdf_utils.py
 
+import os
 from typing import List
-from io import BytesIO
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 import requests
-from pypdf import PdfReader
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pypdfium2 as pdfium
+
+import cache
 
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; ESGScraper/1.0)"
 }
 
+# Reports bigger than this are almost always image scans we can't extract anyway
+MAX_PDF_BYTES = 50 * 1024 * 1024
+
+
+def _make_adapter() -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+
 
-def _extract_single_pdf(url: str, timeout: int = 40) -> str:
+# Keep-alive session so repeat fetches from the same host reuse TCP/TLS connections
+_SESSION = requests.Session()
+_SESSION.headers.update(DEFAULT_HEADERS)
+_SESSION.mount("https://", _make_adapter())
+_SESSION.mount("http://", _make_adapter())
+
+
+def _download_pdf(url: str, timeout: int = 40) -> bytes | None:
     """
-    Download a single PDF and extract text.
-    Returns empty string on any failure.
+    Stream a single PDF, bailing out as soon as the response is clearly not a
+    PDF or grows past MAX_PDF_BYTES. Returns None on any failure.
     """
     try:
-        resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=timeout)
-        resp.raise_for_status()
+        with _SESSION.get(url, timeout=timeout, stream=True) as resp:
+            resp.raise_for_status()
+
+            ctype = resp.headers.get("Content-Type", "").lower()
+            if "pdf" not in ctype and not url.lower().endswith(".pdf"):
+                return None
+
+            clen = int(resp.headers.get("Content-Length") or 0)
+            if clen > MAX_PDF_BYTES:
+                return None
+
+            # Size the buffer once from Content-Length and fill it in place,
+            # rather than re-growing it chunk by chunk
+            buf = bytearray(clen)
+            view = memoryview(buf)
+            pos = 0
+            for chunk in resp.iter_content(65536):
+                end = pos + len(chunk)
+                if end > MAX_PDF_BYTES:
+                    return None
+                if view is not None and end <= clen:
+                    view[pos:end] = chunk
+                else:
+                    if view is not None:
+                        # Content-Length missing or understated (compressed): grow as we go
+                        view.release()
+                        view = None
+                        del buf[pos:]
+                    buf.extend(chunk)
+                pos = end
+
+            if view is not None:
+                view.release()
+            del buf[pos:]
+
+            # PDFium only accepts bytes
+            return bytes(buf)
+    except Exception:
+        return None
 
-        data = BytesIO(resp.content)
-        reader = PdfReader(data)
 
-        pages_text = []
-        for page in reader.pages:
+def _extract_pdf_bytes(data: bytes) -> str:
+    """
+    Extract text from PDF bytes with PDFium (C++), page by page.
+    Runs in a worker process, so it must stay a top-level function.
+    Returns empty string on any failure.
+    """
+    try:
+        pdf = pdfium.PdfDocument(data)
+    except Exception:
+        return ""
+
+    pages_text = []
+    try:
+        for page in pdf:
             try:
-                text = page.extract_text() or ""
+                text = page.get_textpage().get_text_range() or ""
                 if text.strip():
                     pages_text.append(text)
             except Exception:
                 continue
+    finally:
+        pdf.close()
 
-        return "\n".join(pages_text)
-    except Exception:
-        return ""
+    return "\n".join(pages_text)
 
 
 def extract_pdf_texts(urls: List[str], max_workers: int = 5) -> List[str]:
     """
     Download and extract text from a list of PDF URLs in parallel.
 
+    Downloads are I/O-bound and run in a thread pool; text extraction is
+    CPU-bound and runs in a process pool so it isn't serialized by the GIL.
+    Each PDF is handed to the extractor as soon as its download finishes.
+    Extracted text is cached on disk by URL, so repeat runs skip both steps.
+
     Returns:
         List of text contents in the SAME order as the input URLs.
         If a PDF fails, the corresponding entry is an empty string.
@@ -51,15 +125,65 @@ def extract_pdf_texts(urls: List[str], max_workers: int = 5) -> List[str]:
         return []
 
     results: List[str] = [""] * len(urls)
-    indexed_urls = list(enumerate(urls))
+    keys = [cache.url_key("pdf_text", url) for url in urls]
 
-    def worker(idx_and_url):
-        idx, url = idx_and_url
-        text = _extract_single_pdf(url)
-        return idx, text
+    pending = []
+    for idx, key in enumerate(keys):
+        cached = cache.get_cached(key)
+        if cached is not None:
+            results[idx] = cached
+        else:
+            pending.append(idx)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        for idx, text in ex.map(worker, indexed_urls):
-            results[idx] = text
+    if not pending:
+        return results
 
-    return results
\ No newline at end of file
+    # Extraction is CPU-bound: use a process pool, or this process if one can't start
+    try:
+        pool = ProcessPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1))
+    except Exception:
+        pool = None
+
+    extractions = {}  # future -> url index
+
+    def finish(fut) -> None:
+        idx = extractions.pop(fut)
+        try:
+            text = fut.result()
+        except Exception:
+            # Worker crashed or pool broke; leave "" and don't cache, it may be transient
+            return
+        results[idx] = text
+        cache.set_cached(keys[idx], text)
+
+    try:
+        # Download concurrently and hand each PDF to the extractor as soon as it
+        # arrives, so only in-flight PDFs are held in memory
+        with ThreadPoolExecutor(max_workers=max_workers) as dl_ex:
+            downloads = {dl_ex.submit(_download_pdf, urls[idx]): idx for idx in pending}
+            for dl in as_completed(downloads):
+                idx = downloads[dl]
+                data = dl.result()
+                if not data:
+                    continue
+
+                if pool is not None:
+                    try:
+                        extractions[pool.submit(_extract_pdf_bytes, data)] = idx
+                    except Exception:
+                        pool = None  # broken pool: extract the rest in this process
+                if pool is None:
+                    results[idx] = _extract_pdf_bytes(data)
+                    cache.set_cached(keys[idx], results[idx])
+                del data
+
+                for fut in [f for f in extractions if f.done()]:
+                    finish(fut)
+
+        for fut in as_completed(list(extractions)):
+            finish(fut)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return results
@@ -3,103 +3,80 @@
 from typing import Dict, Any
 
 
-def _clamp(x: float, lo: float = 0, hi: float = 100) -> float:
-    return max(lo, min(hi, x))
-
-
-def _score_environment(E: Dict[str, Any]) -> int:
-    score = 0.0
-
+# Bonus helpers: each returns a function mapping the raw value to extra points
+# (0 when the value is missing or of the wrong type).
+def _at_most(*tiers):
+    def bonus(year):
+        if not isinstance(year, int):
+            return 0
+        return next((pts for limit, pts in tiers if year <= limit), 0)
+    return bonus
+
+
+def _at_least(*tiers):
+    def bonus(pct):
+        if not isinstance(pct, (int, float)):
+            return 0
+        return next((pts for limit, pts in tiers if pct >= limit), 0)
+    return bonus
+
+
+def _linear(rate: float, cap: float):
+    def bonus(pct):
+        if not isinstance(pct, (int, float)):
+            return 0
+        return min(pct * rate, cap)
+    return bonus
+
+
+# (flag, points, bonus_key, bonus) -- the bonus only counts when the flag is set
+E_RULES = [
     # Core climate posture
-    if E.get("has_net_zero_target"):
-        score += 35
-        year = E.get("net_zero_year")
-        if isinstance(year, int):
-            if year <= 2030:
-                score += 5
-            elif year <= 2050:
-                score += 2
-
-    if E.get("uses_renewable_energy"):
-        score += 25
-        pct = E.get("renewable_share_pct")
-        if isinstance(pct, (int, float)):
-            # small bonus if we know the share
-            score += min(pct * 0.1, 5)  # up to +5
+    ("has_net_zero_target", 35, "net_zero_year", _at_most((2030, 5), (2050, 2))),
+    ("uses_renewable_energy", 25, "renewable_share_pct", _linear(0.1, 5)),  # up to +5
 
     # Disclosure is now a bonus, not the backbone of E
-    if E.get("discloses_scope_1_2"):
-        score += 10
-    if E.get("discloses_scope_3"):
-        score += 10
-
-    return int(round(_clamp(score)))
-
-
-def _score_social(S: Dict[str, Any]) -> int:
-    score = 0.0
+    ("discloses_scope_1_2", 10, None, None),
+    ("discloses_scope_3", 10, None, None),
+]
 
+S_RULES = [
     # Core "hard" social signals
-    if S.get("has_diversity_policy"):
-        score += 20
-        pct = S.get("female_leadership_pct")
-        if isinstance(pct, (int, float)):
-            if pct >= 40:
-                score += 15
-            elif pct >= 25:
-                score += 10
-            elif pct >= 10:
-                score += 5
-
-    if S.get("employee_wellbeing_programs"):
-        score += 15
-    if S.get("workplace_safety_programs"):
-        score += 15
-    if S.get("community_programs"):
-        score += 15
+    ("has_diversity_policy", 20, "female_leadership_pct", _at_least((40, 15), (25, 10), (10, 5))),
+    ("employee_wellbeing_programs", 15, None, None),
+    ("workplace_safety_programs", 15, None, None),
+    ("community_programs", 15, None, None),
 
     # Softer "mentions" signals – partial credit like we effectively did for E
-    if S.get("mentions_diversity_or_inclusion"):
-        score += 10
-    if S.get("mentions_employee_safety_or_health"):
-        score += 10
-    if S.get("mentions_community_or_philanthropy"):
-        score += 10
-
-    return int(round(_clamp(score)))
-
-
-def _score_governance(G: Dict[str, Any]) -> int:
-    score = 0.0
+    ("mentions_diversity_or_inclusion", 10, None, None),
+    ("mentions_employee_safety_or_health", 10, None, None),
+    ("mentions_community_or_philanthropy", 10, None, None),
+]
 
+G_RULES = [
     # Core "hard" governance signals
-    if G.get("has_independent_board"):
-        score += 20
-        pct = G.get("board_independence_pct")
-        if isinstance(pct, (int, float)):
-            if pct >= 60:
-                score += 15
-            elif pct >= 40:
-                score += 10
-            elif pct >= 25:
-                score += 5
-
-    if G.get("has_anti_corruption_policy"):
-        score += 15
-    if G.get("has_whistleblower_mechanism"):
-        score += 15
-    if G.get("has_esg_governance_structure"):
-        score += 20
+    ("has_independent_board", 20, "board_independence_pct", _at_least((60, 15), (40, 10), (25, 5))),
+    ("has_anti_corruption_policy", 15, None, None),
+    ("has_whistleblower_mechanism", 15, None, None),
+    ("has_esg_governance_structure", 20, None, None),
 
     # Softer "mentions" signals – partial credit
-    if G.get("mentions_board_or_directors"):
-        score += 10
-    if G.get("mentions_ethics_or_code_of_conduct"):
-        score += 10
-    if G.get("mentions_compliance_or_risk_management"):
-        score += 10
+    ("mentions_board_or_directors", 10, None, None),
+    ("mentions_ethics_or_code_of_conduct", 10, None, None),
+    ("mentions_compliance_or_risk_management", 10, None, None),
+]
 
-    return int(round(_clamp(score)))
+
+def _score_pillar(signals: Dict[str, Any], rules) -> int:
+    score = 0.0
+    for flag, points, bonus_key, bonus in rules:
+        if signals.get(flag):
+            score += points
+            if bonus is not None:
+                score += bonus(signals.get(bonus_key))
+    # Clamp to 0..100 inline
+    score = 0.0 if score < 0 else 100.0 if score > 100 else score
+    return int(round(score))
 
 
 def compute_esg_scores(esg_signals: Dict[str, Any]) -> Dict[str, int]:
@@ -107,10 +84,14 @@ def compute_esg_scores(esg_signals: Dict[str, Any]) -> Dict[str, int]:
     S_signals = esg_signals.get("S", {}) or {}
     G_signals = esg_signals.get("G", {}) or {}
 
-    e = _score_environment(E_signals)
-    s = _score_social(S_signals)
-    g = _score_governance(G_signals)
+    # Common 'no data' path: nothing to score
+    if not (E_signals or S_signals or G_signals):
+        return {"E": 0, "S": 0, "G": 0, "total": 0}
+
+    e = _score_pillar(E_signals, E_RULES)
+    s = _score_pillar(S_signals, S_RULES)
+    g = _score_pillar(G_signals, G_RULES)
 
     total = int(round((e + s + g) / 3)) if (e or s or g) else 0
 
-    return {"E": e, "S": s, "G": g, "total": total}
\ No newline at end of file
+    return {"E": e, "S": s, "G": g, "total": total}
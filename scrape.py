@@ -1,8 +1,18 @@
 # scrape.py
+import asyncio
+import hashlib
+import itertools
+import re
+from functools import lru_cache
+
+import httpx
 import requests
-from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
-from collections import deque
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse, urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from selectolax.lexbor import LexborHTMLParser
+
+import cache
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; ESGScraper/1.0)"
@@ -13,7 +23,35 @@ ESG_KEYWORDS = [
     "environment", "governance", "social", "csr"
 ]
 
+# Single-pass matchers for the keyword lists (apply to lowercased text)
+ESG_KEYWORD_RE = re.compile("|".join(re.escape(k) for k in ESG_KEYWORDS))
+_ESG_PDF_ANCHOR_RE = re.compile(
+    "|".join(re.escape(k) for k in ESG_KEYWORDS + ["report", "annual", "impact"])
+)
+
+# Query params that never change page content
+TRACKING_PARAMS = {"fbclid", "gclid"}
+
+# Max pages fetched at once while crawling
+CRAWL_CONCURRENCY = 16
+
 
+def _make_adapter() -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+
+
+# Keep-alive session so repeat fetches from the same host reuse TCP/TLS connections
+_SESSION = requests.Session()
+_SESSION.headers.update(DEFAULT_HEADERS)
+_SESSION.mount("https://", _make_adapter())
+_SESSION.mount("http://", _make_adapter())
+
+
+@lru_cache(maxsize=4096)
 def _root_domain(url: str) -> str:
     """
     Get a simple root domain, e.g.:
@@ -30,6 +68,25 @@ def _root_domain(url: str) -> str:
     return netloc
 
 
+@lru_cache(maxsize=4096)
+def _canonicalize(url: str) -> str:
+    """
+    Normalize a URL for de-duplication:
+      - lowercase scheme and host
+      - drop the #fragment
+      - drop tracking params (utm_*, fbclid, gclid)
+      - drop a trailing "/" from the path
+    e.g. https://X.com/page/?utm_source=a#top -> https://x.com/page
+    """
+    parts = urlsplit(url)
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ])
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
 def is_same_domain(base_url: str, target_url: str) -> bool:
     """
     Consider subdomains as the same site.
@@ -37,6 +94,7 @@ def is_same_domain(base_url: str, target_url: str) -> bool:
     return _root_domain(base_url) == _root_domain(target_url)
 
 
+@lru_cache(maxsize=4096)
 def looks_relevant(url: str, esg_only: bool = True) -> bool:
     """
     If esg_only is True, only follow URLs that look ESG-related.
@@ -45,82 +103,213 @@ def looks_relevant(url: str, esg_only: bool = True) -> bool:
     if not esg_only:
         return True
 
-    url_lower = url.lower()
-    return any(k in url_lower for k in ESG_KEYWORDS)
+    return bool(ESG_KEYWORD_RE.search(url.lower()))
+
+
+def _priority(url: str, depth: int) -> int:
+    """
+    Crawl order key (lower = sooner): URLs whose path mentions more ESG
+    keywords go first, and each extra click away from the root costs a little.
+    """
+    return -(len(ESG_KEYWORD_RE.findall(url.lower())) * 10 - depth)
+
+
+def _remember_html(key: str, body: str, headers) -> None:
+    cache.set_cached(key, {
+        "body": body,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    })
 
 
-def fetch_html(url: str, timeout: int = 15) -> str:
-    resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=timeout)
+def fetch_html(url: str, timeout: int = 15, max_bytes: int | None = None) -> str:
+    """
+    GET a page, revalidating against the on-disk cache:
+    a 304 Not Modified returns the cached body without re-downloading it.
+    If max_bytes is set, the body is streamed and a ValueError is raised as
+    soon as it grows past that size.
+    """
+    key = cache.url_key("html", url)
+    entry = cache.get_cached(key)
+
+    with _SESSION.get(url, headers=cache.conditional_headers(entry), timeout=timeout, stream=True) as resp:
+        if resp.status_code == 304 and entry:
+            return entry["body"]
+        resp.raise_for_status()
+
+        if max_bytes is None:
+            body = resp.text
+        else:
+            if int(resp.headers.get("Content-Length") or 0) > max_bytes:
+                raise ValueError(f"{url} is larger than {max_bytes} bytes")
+            buf = bytearray()
+            for chunk in resp.iter_content(65536):
+                buf.extend(chunk)
+                if len(buf) > max_bytes:
+                    raise ValueError(f"{url} is larger than {max_bytes} bytes")
+            body = buf.decode(resp.encoding or "utf-8", errors="replace")
+
+    _remember_html(key, body, resp.headers)
+    return body
+
+
+async def _fetch_html_async(client: httpx.AsyncClient, url: str) -> str:
+    """
+    Async twin of fetch_html, sharing the same on-disk cache.
+    """
+    key = cache.url_key("html", url)
+    entry = cache.get_cached(key)
+
+    resp = await client.get(url, headers=cache.conditional_headers(entry))
+    if resp.status_code == 304 and entry:
+        return entry["body"]
     resp.raise_for_status()
+
+    _remember_html(key, resp.text, resp.headers)
     return resp.text
 
 
-def html_to_text(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    text = soup.get_text(separator="\n")
+def parse_html(html: str) -> tuple[str, list[tuple[str, str]]]:
+    """
+    Parse a page ONCE with selectolax (C, lexbor) and return:
+        text: visible text, one non-empty stripped line per line
+              (script/style/noscript removed)
+        links: list of (href, anchor_text)
+    """
+    tree = LexborHTMLParser(html)
+
+    links = []
+    for a in tree.css("a[href]"):
+        href = a.attributes.get("href")
+        if href:
+            links.append((href, a.text() or ""))
+
+    tree.strip_tags(["script", "style", "noscript"])
+    root = tree.root
+    text = root.text(separator="\n") if root is not None else ""
     lines = [l.strip() for l in text.splitlines()]
     lines = [l for l in lines if l]
-    return "\n".join(lines)
+    return "\n".join(lines), links
 
 
-def crawl_site(
+async def crawl_site_async(
     root_url: str,
     max_pages: int = 15,
     max_depth: int = 2,
     esg_only: bool = True,
 ) -> tuple[dict, list]:
     """
-    Crawl starting from root_url.
-
-    Returns:
-        pages: dict[url -> clean_text]
-        pdf_urls: list of ESG-ish PDF URLs found while crawling
-
-    If esg_only=True, only follow ESG-related URLs (by path).
-    If esg_only=False, follow all same-root-domain URLs.
+    Async version of crawl_site: up to CRAWL_CONCURRENCY pages are fetched
+    at once over a shared HTTP/2 client. Same return shape as crawl_site.
+    The frontier is a priority queue (see _priority), so with a fixed page
+    budget the most ESG-looking URLs are fetched first.
     """
-    visited = set()
-    to_visit = deque()
-    to_visit.append((root_url, 0))
+    queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+    order = itertools.count()  # tie-breaker: FIFO among equal priorities
+    queue.put_nowait((_priority(root_url, 0), next(order), root_url, 0))
+    visited = set()  # canonical URLs
+    seen_content = {}  # sha1 of page text -> url kept, to skip mirrors under different URLs
     pages = {}
-    pdf_urls = set()
+    page_seq = {}  # url -> queue sequence number, to return pages in a stable order
+    pdf_urls = {}  # canonical -> first URL seen
 
-    while to_visit and len(pages) < max_pages:
-        url, depth = to_visit.popleft()
-        if url in visited or depth > max_depth:
-            continue
-        visited.add(url)
-
-        try:
-            html = fetch_html(url)
-        except Exception:
-            continue
-
-        text = html_to_text(html)
-        pages[url] = text
-
-        soup = BeautifulSoup(html, "html.parser")
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            full = urljoin(url, href)
+    def enqueue_links(url: str, depth: int, links: list[tuple[str, str]]) -> None:
+        for href, anchor_text in links:
+            # Malformed hrefs (e.g. "http://[bad") raise ValueError; skip just that link
+            try:
+                full = urljoin(url, href)
+                full_canon = _canonicalize(full)
+                same_domain = is_same_domain(root_url, full)
+            except ValueError:
+                continue
 
             # Collect ESG-ish PDFs
-            if full.lower().endswith(".pdf"):
-                anchor_text = (a.get_text() or "").lower()
-                full_lower = full.lower()
-                if any(k in full_lower for k in ESG_KEYWORDS) or \
-                   any(k in anchor_text for k in ESG_KEYWORDS + ["report", "annual", "impact"]):
-                    pdf_urls.add(full)
+            full_lower = full_canon.lower()
+            if full_lower.endswith(".pdf"):
+                if ESG_KEYWORD_RE.search(full_lower) or \
+                   _ESG_PDF_ANCHOR_RE.search(anchor_text.lower()):
+                    pdf_urls.setdefault(full_canon, full)
                 continue
 
             # Skip non-HTML links for crawling
-            if not is_same_domain(root_url, full):
+            if not same_domain:
                 continue
-            if full in visited:
+            if full_canon in visited:
                 continue
             if looks_relevant(full, esg_only=esg_only):
-                to_visit.append((full, depth + 1))
+                queue.put_nowait((_priority(full, depth + 1), next(order), full, depth + 1))
+
+    async def visit(client: httpx.AsyncClient, seq: int, url: str, depth: int) -> None:
+        canon = _canonicalize(url)
+        if canon in visited or depth > max_depth or len(pages) >= max_pages:
+            return
+        visited.add(canon)
+
+        html = await _fetch_html_async(client, url)
+
+        # Other workers may have filled the budget while we were fetching
+        if len(pages) >= max_pages:
+            return
+
+        text, links = parse_html(html)
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        kept = seen_content.get(digest)
+        if kept is not None:
+            # Keep whichever copy was enqueued first, not whichever finished first
+            if page_seq[kept] < seq:
+                return
+            del pages[kept]
+        seen_content[digest] = url
+        pages[url] = text
+        page_seq[url] = seq
+
+        enqueue_links(url, depth, links)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            _, seq, url, depth = await queue.get()
+            try:
+                await visit(client, seq, url, depth)
+            except Exception:
+                # A bad page must never kill the worker, or queue.join() would hang
+                pass
+            finally:
+                queue.task_done()
+
+    async with httpx.AsyncClient(
+        http2=True,
+        headers=DEFAULT_HEADERS,
+        timeout=15,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+    ) as client:
+        workers = [asyncio.create_task(worker(client)) for _ in range(CRAWL_CONCURRENCY)]
+        await queue.join()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    # Workers finish in network order; sort by enqueue order so runs are reproducible
+    pages = {url: pages[url] for url in sorted(pages, key=page_seq.__getitem__)}
+    return pages, list(pdf_urls.values())
 
-    return pages, list(pdf_urls)
\ No newline at end of file
+
+def crawl_site(
+    root_url: str,
+    max_pages: int = 15,
+    max_depth: int = 2,
+    esg_only: bool = True,
+) -> tuple[dict, list]:
+    """
+    Crawl starting from root_url.
+
+    Returns:
+        pages: dict[url -> clean_text]
+        pdf_urls: list of ESG-ish PDF URLs found while crawling
+
+    If esg_only=True, only follow ESG-related URLs (by path).
+    If esg_only=False, follow all same-root-domain URLs.
+
+    Pages are fetched concurrently (see crawl_site_async).
+    """
+    return asyncio.run(crawl_site_async(root_url, max_pages, max_depth, esg_only))
@@ -1,35 +1,235 @@
 # text_utils.py
 
-from typing import List
+import hashlib
+import io
+from array import array
+from itertools import groupby
+from typing import Callable, Hashable, Iterable, Iterator, List, TextIO, Tuple
+
+import numpy as np
+
+def _iter_combined_pieces(pages: dict) -> Iterator[str]:
+    # The pieces of the combine_pages_text format, in order
+    first = True
+    for url, txt in pages.items():
+        s = txt.strip()
+        if not s:
+            continue
+        if not first:
+            yield "\n\n"
+        yield "[URL: "
+        yield url
+        yield "]\n"
+        yield s
+        yield "\n"
+        first = False
+
+
+def write_combined(pages: dict, sink: TextIO) -> None:
+    """
+    Stream a dict of {url: cleaned_text} into any text sink (StringIO, open
+    file, ...) in the combine_pages_text format, one page at a time.
+    """
+    for piece in _iter_combined_pieces(pages):
+        sink.write(piece)
+
 
 def combine_pages_text(pages: dict) -> str:
     """
     Join a dict of {url: cleaned_text} into one large text block.
+    Written straight into one buffer, so page texts are copied only once.
     """
-    parts = []
-    for url, txt in pages.items():
-        if txt.strip():
-            parts.append(f"[URL: {url}]\n{txt.strip()}\n")
-    return "\n\n".join(parts)
+    buf = io.StringIO()
+    write_combined(pages, buf)
+    return buf.getvalue()
+
+
+def dedupe_preserve_order(urls: Iterable[str]) -> List[str]:
+    # dicts keep insertion order, so this is an order-preserving dedupe in one C pass
+    return list(dict.fromkeys(urls))
+
+
+def dedupe_sorted(items: Iterable[str]) -> List[str]:
+    # Sort + drop adjacent repeats; output is sorted, not in first-seen order
+    return [k for k, _ in groupby(sorted(items))]
+
+
+def dedupe(items: Iterable[str], *, preserve_order: bool = True) -> List[str]:
+    """
+    Remove duplicates. Keeps first-seen order by default; pass
+    preserve_order=False to get the sorted unique items instead.
+    """
+    return dedupe_preserve_order(items) if preserve_order else dedupe_sorted(items)
+
+
+def fingerprint(text: str) -> bytes:
+    """
+    8-byte BLAKE2b digest of a string, for de-duplicating long texts.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def dedupe_by_fingerprint(
+    items: Iterable[str],
+    *,
+    hasher: Callable[[str], Hashable] = fingerprint,
+) -> List[str]:
+    """
+    Order-preserving de-duplication keyed on hasher(item) instead of the item.
+    Opt-in only: for in-memory strings a plain set is faster (str hashes are
+    cached). Use this when the key must be stable across runs, e.g. to match
+    against fingerprints stored on disk.
+    """
+    seen = set()
+    out = []
+    for it in items:
+        h = hasher(it)
+        if h not in seen:
+            seen.add(h)
+            out.append(it)
+    return out
+
+
+def _chunk_count(length: int, chunk_size: int, step: int) -> int:
+    """
+    Number of chunk windows over a text: one covering the start, plus one
+    per step until a window reaches the end of the text.
+    """
+    # ceil((length - chunk_size) / step) + 1, with the <= chunk_size and empty
+    # cases folded in by max() and the (length > 0) term instead of branches
+    return int(length > 0) + max(0, -(-(length - chunk_size) // step))
+
+
+def _check_window(chunk_size: int, overlap: int) -> None:
+    # Each chunk must advance by at least one character
+    if not 0 <= overlap < chunk_size:
+        raise ValueError(f"need 0 <= overlap < chunk_size, got overlap={overlap}, chunk_size={chunk_size}")
+
+
+def chunk_offsets(length: int, chunk_size: int = 2000, overlap: int = 200) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (starts, ends) arrays for every overlapping window over a text of the
+    given length, computed in one vectorized pass without looking at the text.
+    """
+    _check_window(chunk_size, overlap)
+    step = chunk_size - overlap
+    starts = np.arange(_chunk_count(length, chunk_size, step), dtype=np.int64) * step
+    ends = np.minimum(starts + chunk_size, length)
+    return starts, ends
+
+
+def chunk_many(
+    texts: List[str],
+    chunk_size: int = 2000,
+    overlap: int = 200,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Chunk offsets for a batch of documents in one go.
+    Returns (doc_ids, starts, ends): chunk i is texts[doc_ids[i]][starts[i]:ends[i]].
+    These are the raw chunk_offsets windows (apply snap_chunk_end to non-final
+    ends for word boundaries). Strings are only sliced when a caller needs them.
+    """
+    _check_window(chunk_size, overlap)
+    step = chunk_size - overlap
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+
+    # Same closed form as _chunk_count, for every document at once
+    counts = (lengths > 0) + np.maximum(0, -(-(lengths - chunk_size) // step))
+
+    doc_ids = np.repeat(np.arange(len(texts), dtype=np.int64), counts)
+    first_chunk = np.cumsum(counts) - counts  # index of each document's first chunk
+    within = np.arange(doc_ids.size, dtype=np.int64) - np.repeat(first_chunk, counts)
+
+    starts = within * step
+    ends = np.minimum(starts + chunk_size, lengths[doc_ids])
+    return doc_ids, starts, ends
+
+
+def snap_chunk_end(text: str, start: int, end: int, step: int) -> int:
+    """
+    Move a non-final chunk end back to the last whitespace before it, so chunks
+    don't cut words in half. Only the overlap [start + step, end) is searched,
+    so no text is lost and the number of chunks doesn't change.
+    """
+    ws = max(text.rfind(c, start + step, end) for c in " \t\n\r")
+    return ws if ws >= 0 else end
+
+
+def chunk_spans(text: str, chunk_size: int = 2000, overlap: int = 200) -> array:
+    """
+    The chunk_text windows as a flat array('Q') of offsets [s0, e0, s1, e1, ...]:
+    16 bytes per chunk instead of a str copy. Slice lazily with iter_chunk_text.
+    """
+    step = chunk_size - overlap
+    starts, ends = chunk_offsets(len(text), chunk_size, overlap)
+
+    spans = array("Q")
+    last = len(starts) - 1
+    for i, (a, b) in enumerate(zip(starts.tolist(), ends.tolist())):
+        spans.append(a)
+        # The final chunk always runs to the end of the text
+        spans.append(b if i == last else snap_chunk_end(text, a, b, step))
+    return spans
+
+
+def iter_chunk_text(text: str, spans: array) -> Iterator[str]:
+    """
+    Yield text[s:e] for each (s, e) pair in a chunk_spans array.
+    """
+    it = iter(spans)
+    for a, b in zip(it, it):
+        yield text[a:b]
+
+
+def iter_chunks(text: str, chunk_size: int = 2000, overlap: int = 200) -> Iterator[str]:
+    """
+    Generator version of chunk_text: yields one chunk at a time, so callers
+    that stream (filter, embed) never hold the whole list.
+    """
+    return iter_chunk_text(text, chunk_spans(text, chunk_size, overlap))
 
 
 def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
     """
     Split text into overlapping chunks.
-    Default: 2000 char chunks with 200 char overlap.
+    Default: 2000 char chunks with 200 char overlap; chunk ends are snapped
+    back to whitespace within the overlap (see snap_chunk_end).
+    Chunks are str because every consumer (regex filter, embedder, LLM prompt)
+    needs str; use chunk_spans for compact (start, end) offsets instead.
+    """
+    it = iter(chunk_spans(text, chunk_size, overlap))
+    return [text[a:b] for a, b in zip(it, it)]
+
+
+def _iter_piece_chunks(pieces: Iterable[str], chunk_size: int, overlap: int) -> Iterator[str]:
     """
-    chunks = []
-    start = 0
-    length = len(text)
+    Chunk the concatenation of `pieces` exactly like chunk_text would, while
+    only ever holding the unconsumed tail plus the newest piece.
+    """
+    _check_window(chunk_size, overlap)
+    step = chunk_size - overlap
+    buf = ""
+    pos = 0  # start of the next chunk within buf
+
+    def next_chunk() -> str:
+        # Not the last chunk (more text follows), so its end is snapped
+        return buf[pos:snap_chunk_end(buf, pos, pos + chunk_size, step)]
 
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunks.append(text[start:end])
+    for piece in pieces:
+        buf = buf[pos:] + piece
+        pos = 0
+        while len(buf) - pos > chunk_size:
+            yield next_chunk()
+            pos += step
 
-        if end == length:
-            break
+    # Whatever is left fits in one final, unsnapped chunk
+    if len(buf) > pos:
+        yield buf[pos:]
 
-        # Move forward by (chunk_size - overlap)
-        start = end - overlap
 
-    return chunks
\ No newline at end of file
+def iter_page_chunks(pages: dict, chunk_size: int = 2000, overlap: int = 200) -> Iterator[str]:
+    """
+    Fused combine_pages_text + iter_chunks: yields the same chunks as
+    iter_chunks(combine_pages_text(pages)) without building the combined text.
+    """
+    return _iter_piece_chunks(_iter_combined_pieces(pages), chunk_size, overlap)